@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+"""
+JSON decoding benchmark: compares the `JSONDecoder` backends (whichever of
+orjson, msgspec and json are installed) on `Posts` responses, both as plain
+dicts (`decode`) and as typed `Post` objects (`decode_posts`).
+
+Payloads are read from `benchmarks/data/*.json`, record some real pages with
+`--record` first. If there are none, a synthetic 100 post page shaped like a
+real response is used instead.
+
+```bash
+python benchmarks/bench_json.py --record 5 --tags akemi_homura
+python benchmarks/bench_json.py
+```
+"""
+
+
+import sys
+import json
+import argparse
+from timeit import repeat
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parent.parent
+DATA = Path(__file__).resolve().parent / "data"
+sys.path.insert(0, str(ROOT / "src"))
+
+import safebooru2
+
+
+def record(pages: int, tags: str) -> None:
+    """
+    Save the raw response bytes of the first `pages` pages for `tags`.
+    """
+    DATA.mkdir(exist_ok=True)
+    handler = safebooru2.RequestHandler()
+    for pid in range(pages):
+        content = handler.get(safebooru2.Posts(tags=tags, pid=pid).url).content
+        if not content.strip(): break
+        (DATA / f"posts_{tags or 'index'}_{pid}.json").write_bytes(content)
+        print(f"Recorded page {pid} ~ {len(content)} bytes")
+
+
+def synthetic_page(count: int = 100) -> bytes:
+    return json.dumps([{
+        "preview_url": f"https://safebooru.org/thumbnails/{i}/thumb_{i}.jpg",
+        "sample_url": f"https://safebooru.org/samples/{i}/sample_{i}.jpg",
+        "file_url": f"https://safebooru.org/images/{i}/{i:040x}.jpg",
+        "directory": 4000 + i, "hash": f"{i:032x}", "width": 1200,
+        "height": 1700, "id": 4000000 + i, "image": f"{i:040x}.jpg",
+        "change": 1650000000 + i, "owner": "danbooru", "parent_id": 0,
+        "rating": "general", "sample": True, "sample_height": 1202,
+        "sample_width": 850, "score": None,
+        "tags": " ".join(f"tag_{i}_{n}" for n in range(30)),
+        "source": "https://www.pixiv.net/artworks/0", "status": "active",
+        "has_notes": False, "comment_count": 0} for i in range(count)]
+    ).encode()
+
+
+def available_backends() -> list:
+    backends = list()
+    for backend in safebooru2.JSONDecoder.BACKENDS:
+        try: safebooru2.JSONDecoder(backend).decode(b"[]")
+        except ImportError: continue
+        backends.append(backend)
+    return backends
+
+
+def bench(payloads: list, repeats: int, number: int) -> None:
+    size = sum(map(len, payloads)) / 1024
+    print(f"{len(payloads)} payload(s), {size:.1f} KiB total\n")
+    print(f"{'backend':<10} {'decode':>12} {'decode_posts':>14}")
+    # None is the default, picking the fastest backend for each method.
+    for backend in available_backends() + [None]:
+        decoder = safebooru2.JSONDecoder(backend)
+        times = list()
+        for method in (decoder.decode, decoder.decode_posts):
+            best = min(repeat(lambda: [method(p) for p in payloads],
+                              repeat=repeats, number=number))
+            times.append(best / number / len(payloads) * 1e6)
+        print(f"{backend or 'auto':<10} {times[0]:9.1f} us " \
+              f"{times[1]:11.1f} us")
+    print("\n(time per payload, best of runs; json is the stdlib fallback)")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--record", type=int, metavar="PAGES")
+    parser.add_argument("--tags", default=str())
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--number", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.record: record(args.record, args.tags)
+    payloads = [p.read_bytes() for p in sorted(DATA.glob("*.json"))] \
+               if DATA.exists() else list()
+    if not payloads:
+        print("No recorded payloads in benchmarks/data, using synthetic page")
+        payloads = [synthetic_page()]
+    bench(payloads, args.repeat, args.number)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
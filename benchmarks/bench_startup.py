@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+"""
+Startup benchmark: time to `import safebooru2` and to construct handlers.
+
+Short lived CLI jobs spend a noticeable amount of their runtime on this, so
+each measurement has a budget; the script exits with status 1 if any of them
+goes over. Run from the repo root:
+
+```bash
+python benchmarks/bench_startup.py
+```
+"""
+
+
+import sys
+import subprocess
+from timeit import timeit
+from statistics import median
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+IMPORT_RUNS = 15
+CONSTRUCT_RUNS = 10_000
+
+# Budgets. The import one is for the package's own modules only (the "self"
+# time `-X importtime` gives them), the stdlib modules it pulls in (mostly
+# `dataclasses`/ `inspect`, ~20-35 ms here) vary too much between machines to
+# budget, so the total is printed for information only. The package's own
+# cost is ~9 ms here, the budget leaves room for slower CI machines; pulling
+# `requests` back in eagerly blows well past it.
+IMPORT_BUDGET_MS = 25.0
+HANDLER_BUDGET_US = 5.0
+SAFEBOORU_BUDGET_US = 10.0
+
+
+def _own_import_ms() -> tuple:
+    """
+    Median (own, total) import time (ms) of the package in a fresh
+    interpreter, from `-X importtime`: own is the summed self time of the
+    `safebooru2` modules, total includes every module imported for it.
+    """
+    cmd = [sys.executable, "-X", "importtime", "-c", "import safebooru2"]
+    env = {"PYTHONPATH": str(ROOT / "src")}
+    own, total = list(), list()
+    for _ in range(IMPORT_RUNS):
+        err = subprocess.run(cmd, env=env, check=True, capture_output=True,
+                             text=True).stderr
+        rows = [line[12:].split("|") for line in err.splitlines()
+                if line.startswith("import time:") and "self" not in line]
+        own.append(sum(int(row[0]) for row in rows
+                       if row[2].strip().startswith("safebooru2")) / 1000)
+        total.append(next(int(row[1]) for row in rows
+                          if row[2].strip() == "safebooru2") / 1000)
+    return median(own), median(total)
+
+
+def main() -> int:
+    import safebooru2
+
+    subprocess.run([sys.executable, "-c", "import safebooru2"], check=True,
+                   env={"PYTHONPATH": str(ROOT / "src")})  # Write the .pyc.
+    own, total = _own_import_ms()
+    results = [
+        ("import (own)", own, IMPORT_BUDGET_MS, "ms"),
+        ("RequestHandler()", timeit(safebooru2.RequestHandler,
+         number=CONSTRUCT_RUNS) / CONSTRUCT_RUNS * 1e6,
+         HANDLER_BUDGET_US, "us"),
+        ("Safebooru()", timeit(safebooru2.Safebooru,
+         number=CONSTRUCT_RUNS) / CONSTRUCT_RUNS * 1e6,
+         SAFEBOORU_BUDGET_US, "us"),
+    ]
+    over = False
+    for name, took, budget, unit in results:
+        status = "ok" if took <= budget else "OVER BUDGET"
+        over = over or took > budget
+        print(f"{name:<20} {took:8.3f} {unit} " \
+              f"(budget {budget} {unit}) {status}")
+    print(f"{'import (total)':<20} {total:8.3f} ms (incl. stdlib, no budget)")
+    return 1 if over else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
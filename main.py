@@ -10,7 +10,7 @@ started with the module until I can do that/ create proper docs.
 """
 
 
-# RequestHandler, Safebooru, Image, Posts, Tags, Comments
+# RequestHandler, Safebooru, Image, Posts, Tags, Comments, JobQueue, Worker
 from src.safebooru2 import *
 
 
@@ -44,6 +44,20 @@ def main():
     # dest = post.image_url(json)
     # Image(dest, sb.image_ext(json)).download(handler, directory="example")
 
+    # Typed posts instead of dicts, parsed with orjson/ msgspec if installed.
+    # for post in Posts(tags="akemi_homura", limit=5).fetch_posts(handler):
+    #     print(post.id, post.width, post.height, post.tags)
+
+    # Get the real type/ size of a post's image without downloading all of it.
+    # print(Image(dest, sb.image_ext(json)).probe(handler))
+
+    # Crawl every post for a tag through a resumable job queue. Re-running
+    # this after a crash picks up from the last checkpointed page/ download,
+    # once a crawl has finished re-running it only fetches the new posts.
+    # with JobQueue("example/crawl.db") as queue:
+    #     Worker.crawl(queue, "akemi_homura", directory="example/homura")
+    #     Worker(queue, sb, verbose=True).run()
+
 
 if __name__ == "__main__":
     main()
@@ -12,15 +12,31 @@ from .safebooru import __version__
 
 __all__ = [
     "ImageType",
+    "JSONDecoder",
     "RequestHandler",
+    "ImageInfo",
     "Image",
+    "Post",
     "Posts",
     "Tags",
     "Comments",
-    "Safebooru"
+    "Safebooru",
+    "Job",
+    "JobQueue",
+    "Worker"
 ]
 
 
+def __getattr__(name: str):
+    """
+    Only import the job queue (and sqlite3 with it) when it is first used.
+    """
+    if name in ("Job", "JobQueue", "Worker"):
+        from . import jobs
+        return getattr(jobs, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 def _main():
     print(f"Safebooru2 (ver: {__version__})\nUnder contruction...")
 
@@ -0,0 +1,467 @@
+"""
+A persistent (SQLite backed) job queue for long running crawls & downloads.
+
+Looping over `Safebooru.download` calls is fine for a handful of posts, but if
+the process dies halfway through a big tag search all progress is lost, there
+is no record of what was already fetched. Jobs are written to an SQLite file
+instead, so several processes can share the same queue and a restarted worker
+just carries on from wherever the last one stopped. The processes need to be
+on the same machine, SQLite's WAL mode does not work over network filesystems
+(NFS, SMB etc.) and the database can be corrupted if tried.
+
+There are two kinds of job:
+
+page:     Fetch one page of `Posts` json; queue a download job for every post
+          on it and a page job for the next page (if the page was full). Pages
+          are walked with the `id:<N` meta-tag rather than `pid` so posts
+          being added/ deleted mid crawl can not shift pages under it.
+download: Fetch a single `Image` and write it to disk.
+
+Jobs are leased to a worker for a set amount of time, if the worker does not
+complete the job before the lease runs out (crash, killed during deploy etc.)
+then it becomes available to other workers again. Failed (or expired) jobs
+are retried up to `max_attempts` times before being marked as failed for good,
+failed ones only after an exponential backoff so a 429/ 503 is not retried
+straight away.
+"""
+
+#region (imports)
+
+import json
+import sqlite3
+from time import time, sleep
+from os import getpid, path, makedirs, replace, remove
+from tempfile import mkstemp
+from socket import gethostname
+from dataclasses import dataclass
+
+from .safebooru import Safebooru, Posts, Image
+
+#endregion
+
+#region (global variables)
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+PAGE = "page"
+DOWNLOAD = "download"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind         TEXT    NOT NULL,
+    payload      TEXT    NOT NULL,
+    key          TEXT    UNIQUE,
+    priority     INTEGER NOT NULL DEFAULT 0,
+    state        TEXT    NOT NULL DEFAULT 'pending',
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    lease_until  REAL    NOT NULL DEFAULT 0,
+    not_before   REAL    NOT NULL DEFAULT 0,
+    worker       TEXT,
+    error        TEXT,
+    created      REAL    NOT NULL,
+    updated      REAL    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready
+    ON jobs (state, priority DESC, id);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    name    TEXT PRIMARY KEY,
+    cursor  TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+# Only the worker holding the current lease may extend/ complete/ fail a job,
+# `attempts` tells apart a worker that re-leased its own expired job.
+_HELD = "id = ? AND state = ? AND worker = ? AND attempts = ?"
+
+# Only pending jobs are ever selected so this runs straight off `jobs_ready`,
+# no sorting; expired leases are moved back to pending before it is run.
+_NEXT_JOB = "SELECT id, kind, payload, attempts FROM jobs " \
+            "WHERE state = ? AND not_before <= ? " \
+            "ORDER BY priority DESC, id LIMIT 1"
+
+# Longest a failed job is held back for before it can be retried (seconds).
+_MAX_BACKOFF = 600.0
+
+#endregion
+
+
+@dataclass(frozen=True)
+class Job:
+    """
+    A single job row leased out of a `JobQueue`.
+
+    id:       The job's row ID in the queue database.
+    kind:     What kind of job it is (`PAGE` or `DOWNLOAD`).
+    payload:  The json decoded arguments for the job.
+    attempts: How many times the job has been leased, including this one.
+    worker:   The name of the worker currently holding the lease.
+    """
+    id: int
+    kind: str
+    payload: dict
+    attempts: int
+    worker: str
+
+
+class JobQueue:
+    """
+    A durable job queue stored in an SQLite database file, safe to share
+    between several processes.
+
+    path:         Path to the database file, created if it does not exist.
+    max_attempts: Default number of attempts before a job is marked failed.
+    timeout:      Seconds to wait on a locked database before giving up.
+    backoff:      Seconds before a failed job is retried, doubled for each
+                  attempt it has already used (up to 10 minutes).
+    """
+    def __init__(self, path: str, max_attempts: int = 3,
+                 timeout: float = 30.0, backoff: float = 1.0) -> None:
+        self.path = path
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.__conn = sqlite3.connect(path, timeout=timeout,
+                                      isolation_level=None)
+        self.__conn.execute("PRAGMA journal_mode=WAL")
+        self.__conn.execute("PRAGMA synchronous=NORMAL")
+        self.__conn.executescript(_SCHEMA)
+
+    def __enter__(self) -> "JobQueue":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.__conn.close()
+
+    def _transaction(self) -> sqlite3.Connection:
+        """
+        Take the write lock straight away so two workers can never both
+        select the same ready job before one of them updates it.
+        """
+        self.__conn.execute("BEGIN IMMEDIATE")
+        return self.__conn
+
+    def _insert(self, kind: str, payload: dict, priority: int = 0,
+                key: str = None, max_attempts: int = None) -> int | None:
+        now = time()
+        max_attempts = self.max_attempts if max_attempts is None \
+                       else max_attempts
+        cur = self.__conn.execute(
+            "INSERT OR IGNORE INTO jobs (kind, payload, key, priority, "
+            "max_attempts, created, updated) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (kind, json.dumps(payload), key, priority, max_attempts, now, now))
+        return cur.lastrowid if cur.rowcount else None
+
+    def put(self, kind: str, payload: dict, priority: int = 0,
+            key: str = None, max_attempts: int = None) -> int | None:
+        """
+        Add a job to the queue, higher priority jobs are leased first. If a
+        job with the same `key` was already queued (at any point) nothing is
+        added and None is returned, otherwise the new job's ID.
+
+        Usage
+        -----
+        ```
+        queue = JobQueue("crawl.db")
+        queue.put(PAGE, {"tags": "akemi_homura", "pid": 0, "limit": 100})
+        ```
+        """
+        conn = self._transaction()
+        try:
+            job_id = self._insert(kind, payload, priority, key, max_attempts)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return job_id
+
+    def lease(self, worker: str, lease_time: float = 60.0) -> Job | None:
+        """
+        Lease the next ready job to `worker` for `lease_time` seconds. Jobs
+        whose lease has expired go back to pending first, unless they have
+        used up all of their attempts (the worker most likely died running
+        them) in which case they are marked as failed. Returns None if there
+        is nothing to do right now.
+        """
+        now = time()
+        conn = self._transaction()
+        try:
+            conn.execute(
+                "UPDATE jobs SET state = CASE WHEN attempts >= max_attempts "
+                "THEN ? ELSE ? END, lease_until = 0, error = ?, updated = ? "
+                "WHERE state = ? AND lease_until < ?",
+                (FAILED, PENDING, "Lease expired", now, LEASED, now))
+            row = conn.execute(_NEXT_JOB, (PENDING, now)).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET state = ?, attempts = attempts + 1, "
+                    "lease_until = ?, worker = ?, updated = ? WHERE id = ?",
+                    (LEASED, now + lease_time, worker, now, row[0]))
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        if row is None: return None
+        return Job(row[0], row[1], json.loads(row[2]), row[3] + 1, worker)
+
+    def extend(self, job: Job, lease_time: float = 60.0) -> bool:
+        """
+        Push back the lease on a job that is taking a while. Returns False if
+        the lease was already lost to another worker.
+        """
+        now = time()
+        cur = self.__conn.execute(
+            "UPDATE jobs SET lease_until = ?, updated = ? WHERE " + _HELD,
+            (now + lease_time, now, job.id, LEASED, job.worker, job.attempts))
+        return cur.rowcount == 1
+
+    def complete(self, job: Job, then: list = None,
+                 checkpoint: tuple = None) -> bool:
+        """
+        Mark a job as done. Follow up jobs (a list of `put` argument dicts)
+        and a (name, cursor) checkpoint are committed in the same transaction
+        so a crash can never leave a job done without its follow ups queued.
+        Returns False, changing nothing, if the lease was lost to another
+        worker.
+        """
+        now = time()
+        conn = self._transaction()
+        try:
+            cur = conn.execute(
+                "UPDATE jobs SET state = ?, lease_until = 0, error = NULL, "
+                "updated = ? WHERE " + _HELD,
+                (DONE, now, job.id, LEASED, job.worker, job.attempts))
+            if cur.rowcount == 1:
+                for follow_up in then or []: self._insert(**follow_up)
+                if checkpoint is not None: self._checkpoint(*checkpoint)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return cur.rowcount == 1
+
+    def fail(self, job: Job, error: str = None) -> bool:
+        """
+        Release a job that raised, it goes back to pending (held back for
+        `backoff` seconds, doubling with each attempt) unless it has used up
+        all of its attempts, in which case it is marked as failed. Returns
+        False, changing nothing, if the lease was lost to another worker.
+        """
+        now = time()
+        delay = min(self.backoff * 2 ** (job.attempts - 1), _MAX_BACKOFF)
+        cur = self.__conn.execute(
+            "UPDATE jobs SET state = CASE WHEN attempts >= max_attempts "
+            "THEN ? ELSE ? END, lease_until = 0, not_before = ?, error = ?, "
+            "updated = ? WHERE " + _HELD,
+            (FAILED, PENDING, now + delay, error, now,
+             job.id, LEASED, job.worker, job.attempts))
+        return cur.rowcount == 1
+
+    def retry_failed(self) -> int:
+        """
+        Put every failed job back to pending with a fresh set of attempts.
+        """
+        cur = self.__conn.execute(
+            "UPDATE jobs SET state = ?, attempts = 0, not_before = 0, "
+            "updated = ? WHERE state = ?", (PENDING, time(), FAILED))
+        return cur.rowcount
+
+    def _checkpoint(self, name: str, cursor) -> None:
+        self.__conn.execute(
+            "INSERT INTO checkpoints (name, cursor, updated) VALUES (?, ?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET cursor = excluded.cursor, "
+            "updated = excluded.updated", (name, json.dumps(cursor), time()))
+
+    def checkpoint(self, name: str, cursor) -> None:
+        """
+        Save a json serialisable cursor under `name`, e.g. the last page of a
+        tag search that was fully queued.
+        """
+        self._checkpoint(name, cursor)
+
+    def cursor(self, name: str, default=None):
+        """
+        Get the cursor last saved under `name`, or `default` if there is none.
+        """
+        row = self.__conn.execute(
+            "SELECT cursor FROM checkpoints WHERE name = ?",
+            (name,)).fetchone()
+        return default if row is None else json.loads(row[0])
+
+    def counts(self) -> dict:
+        """
+        Number of jobs in each state, handy for progress output.
+        """
+        rows = self.__conn.execute(
+            "SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        return {state: 0 for state in (PENDING, LEASED, DONE, FAILED)} \
+               | dict(rows)
+
+
+class Worker:
+    """
+    Drives `Posts` and `Image` through a `JobQueue`, run as many of these as
+    you like (in separate processes on the machine holding the file).
+
+    The lease on a download is renewed while the image is streamed, page
+    jobs are a single small request and are expected to finish well inside
+    `lease_time`.
+
+    queue:      The job queue to lease jobs from.
+    sb:         The `Safebooru` object whose handler is used for requests.
+    name:       The worker name recorded against leased jobs.
+    lease_time: How long (seconds) a job is leased for.
+    verbose:    Print information about each job as it runs.
+    """
+    def __init__(self, queue: JobQueue, sb: Safebooru = None,
+                 name: str = None, lease_time: float = 60.0,
+                 verbose: bool = False) -> None:
+        self.queue = queue
+        self.sb = sb if sb is not None else Safebooru()
+        self.name = name if name is not None \
+                    else f"{gethostname()}:{getpid()}"
+        self.lease_time = lease_time
+        self.verbose = verbose
+
+    @staticmethod
+    def _crawl_name(tags: str, limit: int, directory: str) -> str:
+        return f"{PAGE}:{tags}:{limit}:{directory}"
+
+    @staticmethod
+    def crawl(queue: JobQueue, tags: str = str(), limit: int = 100,
+              directory: str = None, priority: int = 0) -> int | None:
+        """
+        Queue up a crawl of every post matching `tags`. Safe to call again
+        at any point: an unfinished crawl resumes from the post ID it had
+        reached, a finished one starts a new pass fetching only the posts
+        added since (IDs above the newest one seen). Returns None if the
+        crawl's next page is already queued.
+
+        Usage
+        -----
+        ```
+        with JobQueue("crawl.db") as queue:
+            Worker.crawl(queue, "akemi_homura", directory="homura")
+            Worker(queue, verbose=True).run()
+        ```
+        """
+        name = Worker._crawl_name(tags, limit, directory)
+        cp = queue.cursor(name)
+        if cp is None:
+            cp = {"pass": 0, "after": None, "before": None, "newest": None}
+        elif cp["before"] is None:  # Last pass finished, only new posts.
+            cp = cp | {"pass": cp["pass"] + 1, "after": cp["newest"]}
+        return queue.put(PAGE, {"tags": tags, "limit": limit,
+                                "directory": directory,
+                                "priority": priority} | cp, priority,
+                         key=f"{name}:{cp['pass']}:{cp['before']}")
+
+    def _page(self, job: Job) -> None:
+        """
+        Fetch a page of posts (newest first, below `before` & above `after`)
+        then queue downloads for each of them and the next page along with
+        the crawl checkpoint.
+        """
+        p = job.payload
+        name = self._crawl_name(p["tags"], p["limit"], p["directory"])
+        tags = p["tags"]
+        if p["after"] is not None: tags += f" id:>{p['after']}"
+        if p["before"] is not None: tags += f" id:<{p['before']}"
+        post_obj = Posts(limit=p["limit"], tags=tags.strip())
+        posts = post_obj.fetch_posts(self.sb.handler)
+        then = [{"kind": DOWNLOAD,
+                 "payload": {"url": post_obj.image_url(post),
+                             "ext": self.sb.image_ext(post),
+                             "filename": post.id,
+                             "directory": p["directory"]},
+                 # Downloads before more pages, keeps the queue from growing.
+                 "priority": p["priority"] + 1,
+                 "key": f"{DOWNLOAD}:{p['directory']}:{post.id}"}
+                for post in posts]
+        ids = [post.id for post in posts]
+        newest = max(ids + ([p["newest"]] if p["newest"] is not None
+                            else list()), default=None)
+        # Next page is everything below this one, None marks the pass done.
+        before = min(ids) if len(posts) == p["limit"] else None
+        cp = {"pass": p["pass"], "after": p["after"], "before": before,
+              "newest": newest}
+        if before is not None:
+            then.append({"kind": PAGE, "payload": p | cp,
+                         "priority": p["priority"],
+                         "key": f"{name}:{p['pass']}:{before}"})
+        if self.verbose: print(f"Page of \"{tags.strip()}\" ~ " \
+                               f"{len(posts)} posts")
+        if not self.queue.complete(job, then, (name, cp)):
+            raise RuntimeError(f"Lease on job {job.id} was lost")
+
+    def _download(self, job: Job) -> None:
+        """
+        Stream the image into a temporary file (unique to this attempt, a
+        worker whose lease expired may still be writing its own), renewing
+        the lease as it goes, then move it into place; HTTP errors raise so
+        the job is retried instead of an error page being saved as the image.
+        """
+        p = job.payload
+        image = Image(p["url"], p["ext"])
+        f = image.file_name(p["filename"])
+        if p["directory"] is not None:
+            makedirs(p["directory"], exist_ok=True)
+            f = path.join(p["directory"], f)
+        renewed = time()
+        response = self.sb.handler.get(image.url, stream=True)
+        fd, part = mkstemp(dir=path.dirname(f) or ".",
+                           prefix=f".{path.basename(f)}.", suffix=".part")
+        try:
+            with open(fd, "wb") as file_object:
+                response.raise_for_status()
+                for chunk in response.iter_content(chunk_size=65536):
+                    file_object.write(chunk)
+                    if time() - renewed < self.lease_time / 3: continue
+                    if not self.queue.extend(job, self.lease_time):
+                        raise RuntimeError(f"Lease on job {job.id} was lost")
+                    renewed = time()
+            replace(part, f)
+        except BaseException:
+            remove(part)
+            raise
+        finally:
+            response.close()
+        if self.verbose: print(f"Downloaded image as: \"{f}\"")
+        if not self.queue.complete(job):
+            raise RuntimeError(f"Lease on job {job.id} was lost")
+
+    def run_once(self) -> bool:
+        """
+        Lease and run a single job. Returns False if there was nothing to do.
+        """
+        job = self.queue.lease(self.name, self.lease_time)
+        if job is None: return False
+        try:
+            if job.kind == PAGE: self._page(job)
+            elif job.kind == DOWNLOAD: self._download(job)
+            else: raise ValueError(f"Unknown job kind: {job.kind}")
+        except Exception as error:
+            self.queue.fail(job, f"{type(error).__name__}: {error}")
+            if self.verbose: print(f"Job {job.id} failed: {error}")
+        return True
+
+    def run(self, wait: bool = False, poll: float = 1.0) -> None:
+        """
+        Keep running jobs until there are none pending or leased to another
+        worker (which may still queue more, or die and leave its job to be
+        picked up here), or forever if `wait` is True. Polls every `poll`
+        seconds while there is nothing to lease yet.
+        """
+        while True:
+            if self.run_once(): continue
+            if not wait:
+                counts = self.queue.counts()
+                if not counts[PENDING] and not counts[LEASED]: return
+            sleep(poll)
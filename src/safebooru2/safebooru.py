@@ -23,14 +23,16 @@ directory, or with this link: <https://www.gnu.org/licenses/gpl-3.0.en.html>
 #region (imports)
 
 from enum import Enum, unique
-from dataclasses import dataclass
+from dataclasses import dataclass, fields, MISSING
+from functools import lru_cache
 from urllib.parse import urljoin, urlparse
-from platform import uname
 from os import path, makedirs
+from struct import unpack_from
 
-import requests
-import xmltodict
-from requests import Session
+# `requests`, `xmltodict`, `platform`, `concurrent` and the json backends are
+# imported where they are first used, they make up most of the import time of
+# the package otherwise. This is why `requests.Session` annotations are
+# strings.
 
 #endregion
 
@@ -39,9 +41,25 @@ from requests import Session
 __version__ = "v1.0.1"
 __license__ = "GNU GPLv3"
 
+# Bytes asked for by the first `Image.probe` range request, and the most it
+# will grow to (JPEGs with big EXIF blocks push the frame header back).
+PROBE_SIZE = 4096
+PROBE_MAX_SIZE = 262144
+
 #endregion
 
 
+@lru_cache(maxsize=None)
+def _default_user_agent() -> str:
+    """
+    Build the default user-agent once, `uname()` does not change at runtime.
+    """
+    from platform import uname
+    system = uname()
+    sys = f"{system.system} {system.machine}; rv:{system.release}"
+    return f"SafebooruPy/{__version__} ({sys})"
+
+
 @unique
 class ImageType(Enum):
     """
@@ -59,6 +77,121 @@ class ImageType(Enum):
         return f".{cls(key).name.lower()}"
 
 
+@lru_cache(maxsize=None)
+def _json_loads(backend: str) -> callable:
+    """
+    Import the named json backend (once) and return its bytes -> obj parser.
+    """
+    if backend == "orjson":
+        import orjson
+        return orjson.loads
+    if backend == "msgspec":
+        import msgspec
+        return _msgspec_errors(msgspec.json.Decoder().decode)
+    if backend == "json":
+        import json
+        return json.loads
+    raise ValueError(f"Unknown json backend: {backend}")
+
+
+def _msgspec_errors(decode: callable) -> callable:
+    """
+    Re-raise `msgspec.DecodeError` (not a ValueError) as the stdlib's
+    `json.JSONDecodeError`, like orjson and `Response.json()` raise, so
+    `except ValueError` works the same whichever backend is in use.
+    """
+    from json import JSONDecodeError
+    from msgspec import DecodeError
+
+    def loads(data: bytes):
+        try: return decode(data)
+        except DecodeError as error:
+            doc = data.decode(errors="replace")
+            raise JSONDecodeError(str(error), doc, 0) from error
+    return loads
+
+
+@lru_cache(maxsize=None)
+def _msgspec_posts_decoder() -> callable:
+    """
+    msgspec can decode straight into `Post` objects, skipping the dicts. No
+    coercion ("123" is not an int), the same checks `Post.from_dict` makes.
+    """
+    import msgspec
+    return _msgspec_errors(msgspec.json.Decoder(list[Post]).decode)
+
+
+@lru_cache(maxsize=None)
+def _first_backend(order: tuple) -> str:
+    """
+    The first json backend in `order` that can be imported.
+    """
+    for backend in order:
+        try: _json_loads(backend)
+        except ImportError: continue
+        return backend
+
+
+class JSONDecoder:
+    """
+    Parses raw json response bytes with the fastest backend available, with
+    the stdlib `json` module as a fallback. For plain dicts/ lists (`decode`)
+    that is `orjson` then `msgspec`, for `Post` objects (`decode_posts`)
+    `msgspec` then `orjson`, as msgspec decodes straight into them.
+
+    backend: Force one backend by name ("orjson", "msgspec" or "json") for
+             both, by default the first one that can be imported is used.
+    """
+    BACKENDS = ("orjson", "msgspec", "json")
+    POSTS_BACKENDS = ("msgspec", "orjson", "json")
+
+    def __init__(self, backend: str = None) -> None:
+        if backend is not None and backend not in self.BACKENDS:
+            raise ValueError(f"Unknown json backend: {backend}")
+        self.__backend = backend
+
+    @property
+    def backend(self) -> str:
+        """
+        Name of the backend used by `decode`, picked on first access (not on
+        init, so creating a handler never pays for importing one).
+        """
+        if self.__backend is not None: return self.__backend
+        return _first_backend(self.BACKENDS)
+
+    @property
+    def posts_backend(self) -> str:
+        """
+        Name of the backend used by `decode_posts`.
+        """
+        if self.__backend is not None: return self.__backend
+        return _first_backend(self.POSTS_BACKENDS)
+
+    def decode(self, data: bytes) -> list | dict:
+        """
+        Parse json bytes (e.g. `Response.content`) into dicts/ lists. Raises
+        `json.JSONDecodeError` (a ValueError) on bad json with any backend.
+        """
+        return _json_loads(self.backend)(data)
+
+    def decode_posts(self, data: bytes) -> list:
+        """
+        Parse a `Posts` json response into a list of `Post` objects. An empty
+        body, which is what safebooru.org sends when no posts match, gives an
+        empty list. Raises ValueError (`json.JSONDecodeError` for malformed
+        json, and for anything at all with msgspec) if the body is not a list
+        of posts matching `Post`; values are never coerced between types.
+        """
+        if not data.strip(): return list()
+        backend = self.posts_backend
+        if backend == "msgspec": return _msgspec_posts_decoder()(data)
+        posts = _json_loads(backend)(data)
+        if type(posts) is not list:
+            raise ValueError(f"Expected a list of posts, got " \
+                             f"{type(posts).__name__}")
+        return [Post.from_dict(json) for json in posts]
+
+
 class RequestHandler:
     """
     A class containing helper methods for building the initial requests
@@ -66,17 +199,19 @@ class RequestHandler:
     data back.
 
     headers: User defined headers to use when sending a request.
+    decoder: The `JSONDecoder` used to parse json responses.
     """
-    def __init__(self, headers: dict = None) -> None:
+    def __init__(self, headers: dict = None,
+                 decoder: JSONDecoder = None) -> None:
         self.headers = headers if headers is not None else self._headers
+        self.decoder = decoder if decoder is not None else JSONDecoder()
 
     @property
     def _user_agent(self) -> str:
         """
         The default user-agent, tried to make it as informative as I could :P.
         """
-        sys = f"{uname()[0]} {uname()[4]}; rv:{uname()[2]}"
-        return f"SafebooruPy/{__version__} ({sys})"
+        return _default_user_agent()
 
     @property
     def _headers(self) -> dict:
@@ -108,11 +243,12 @@ class RequestHandler:
         return urljoin(base_url, f"{dest}{format_params}")
 
     @property
-    def session(self) -> Session:
+    def session(self) -> "requests.Session":
         """
         If possible, always only ever use one instance of session; idea being
         it is meant to be persistent, you should only need one.
         """
+        from requests import Session
         session = Session()
         session.headers.update(
             self.headers if self.headers else self._headers)
@@ -122,6 +258,118 @@ class RequestHandler:
         return self.session.get(url, **kwargs)
 
 
+@dataclass(frozen=True)
+class ImageInfo:
+    """
+    The real format and dimensions of an image, read from its header bytes.
+
+    type:     The image format as an `ImageType`.
+    width:    Width in pixels.
+    height:   Height in pixels.
+    frames:   Number of frames. Exact for PNG (APNG) and JPEG, for GIF it is
+              only known if the bytes parsed reach the end of the file, None
+              otherwise (which is almost always the case for `Image.probe`).
+    animated: Whether the image is animated. For GIF this is from the
+              NETSCAPE2.0 looping extension or finding more than one frame,
+              None if neither was found and the file was not parsed to the
+              end (a multi-frame GIF with no looping extension and a large
+              first frame can not be told apart from a still one).
+    """
+    type: ImageType
+    width: int
+    height: int
+    frames: int | None = 1
+    animated: bool | None = False
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "ImageInfo | None":
+        """
+        Parse the start of a PNG, JPEG or GIF file. Returns None if there are
+        not enough bytes to reach the dimensions yet, raises ValueError if
+        the data is not one of those formats.
+
+        Usage
+        -----
+        ```
+        with open("magia.png", "rb") as file_object:
+            print(ImageInfo.from_bytes(file_object.read(4096)))
+        ```
+        """
+        if data.startswith(b"\x89PNG\r\n\x1a\n"): return cls._png(data)
+        if data.startswith(b"\xff\xd8"): return cls._jpg(data)
+        if data[:6] in (b"GIF87a", b"GIF89a"): return cls._gif(data)
+        if len(data) < 8: return None
+        raise ValueError("Data is not a PNG, JPEG or GIF image")
+
+    @classmethod
+    def _png(cls, data: bytes) -> "ImageInfo | None":
+        if len(data) < 24: return None
+        width, height = unpack_from(">II", data, 16)
+        frames, i = 1, 8
+        # An APNG has its acTL chunk (holding the frame count) before IDAT.
+        while True:
+            # Ran out before IDAT/ acTL, the frame count is not known yet.
+            if i + 8 > len(data): return None
+            length, chunk = unpack_from(">I4s", data, i)
+            if chunk == b"IDAT": break
+            if chunk == b"acTL":
+                if i + 12 > len(data): return None
+                frames = unpack_from(">I", data, i + 8)[0]
+                break
+            i += 12 + length
+        return cls(ImageType.PNG, width, height, frames, frames > 1)
+
+    @classmethod
+    def _jpg(cls, data: bytes) -> "ImageInfo | None":
+        i = 2
+        while i + 4 <= len(data):
+            if data[i] != 0xFF: raise ValueError("Corrupt JPEG segment")
+            marker = data[i + 1]
+            if marker == 0xFF:  # Fill byte.
+                i += 1
+            elif marker == 0x01 or 0xD0 <= marker <= 0xD7:  # No length.
+                i += 2
+            # SOFn frame headers, excluding DHT (C4), JPG (C8) and DAC (CC).
+            elif 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                if i + 9 > len(data): return None
+                height, width = unpack_from(">HH", data, i + 5)
+                return cls(ImageType.JPG, width, height)
+            else: i += 2 + unpack_from(">H", data, i + 2)[0]
+        return None
+
+    @classmethod
+    def _gif(cls, data: bytes) -> "ImageInfo | None":
+        if len(data) < 13: return None
+        width, height, flags = unpack_from("<HHB", data, 6)
+        frames, looping, i = 0, False, 13
+        if flags & 0x80: i += 3 << ((flags & 0x07) + 1)  # Global colour table.
+
+        def skip_sub_blocks(i: int) -> int:
+            while i < len(data) and data[i]: i += data[i] + 1
+            return i + 1
+
+        while i < len(data) and data[i] != 0x3B:  # 0x3B is the trailer.
+            if data[i] == 0x21:  # Extension: introducer, label, sub-blocks.
+                if data[i + 1:i + 3] == b"\xff\x0b" and \
+                   data[i + 3:i + 14] in (b"NETSCAPE2.0", b"ANIMEXTS1.0"):
+                    looping = True
+                i = skip_sub_blocks(i + 2)
+            elif data[i] == 0x2C:  # Image descriptor, one per frame.
+                frames += 1
+                if i + 10 > len(data): break
+                local = data[i + 9]
+                i += 10
+                if local & 0x80: i += 3 << ((local & 0x07) + 1)
+                i = skip_sub_blocks(i + 1)  # LZW min code size, then data.
+            else: raise ValueError("Corrupt GIF block")
+        # Only reaching the trailer means every frame has been counted.
+        complete = i < len(data) and data[i] == 0x3B
+        animated = True if looping or frames > 1 else \
+                   False if complete else None
+        return cls(ImageType.GIF, width, height,
+                   frames if complete else None, animated)
+
+
 @dataclass(frozen=True)
 class Image:
     """
@@ -166,6 +414,164 @@ class Image:
             if verbose: print(f"Downloading image as: \"{f}\" ~ size: {size}")
             file_object.write(img_bytes)
 
+    def _fetch_range(self, session: "requests.Session",
+                     start: int, end: int) -> bytes:
+        """
+        Fetch (at most) bytes `start` up to `end` of the image with a range
+        request. Streamed, so a server ignoring the range (200 rather than
+        206, sending from byte 0) only costs the bytes up to `end`.
+        """
+        response = session.get(self.url, stream=True,
+                               headers={"Range": f"bytes={start}-{end - 1}"})
+        try:
+            if response.status_code == 416: return bytes()  # Past the end.
+            response.raise_for_status()
+            skip = 0 if response.status_code == 206 else start
+            data = bytes()
+            for chunk in response.iter_content(chunk_size=end - start):
+                data += chunk
+                if len(data) >= end - start + skip: break
+            return data[skip:end - start + skip]
+        finally:
+            response.close()
+
+    def probe(self, handler: RequestHandler, size: int = PROBE_SIZE,
+              max_size: int = PROBE_MAX_SIZE,
+              session: "requests.Session" = None) -> ImageInfo:
+        """
+        Get the real format, dimensions and frame count of the image without
+        downloading all of it, only the first `size` bytes are fetched (more,
+        up to `max_size`, if the header has not been reached by then; each
+        extra request only asks for the bytes not fetched yet). All of the
+        requests go over one session (`session` if given, left open) so the
+        connection is reused.
+
+        Usage
+        -----
+        ```
+        handler = RequestHandler()
+        img = Image("https://safebooru.org/images/4038/2453" \
+                    "29a0ea470d939fdfd436253fbd035a926e0b.jpg?4219608", "j")
+        print(img.probe(handler))
+        ```
+        """
+        if session is None:
+            with handler.session as session:
+                return self.probe(handler, size, max_size, session)
+        data = bytes()
+        while True:
+            data += self._fetch_range(session, len(data), size)
+            info = ImageInfo.from_bytes(data)
+            if info is not None: return info
+            if len(data) < size or size >= max_size:  # Whole file, or gave up.
+                raise ValueError(f"No image header in first {len(data)} bytes")
+            size = min(size * 2, max_size)
+
+    @staticmethod
+    def probe_many(images: list, handler: RequestHandler,
+                   workers: int = 8, **kwargs) -> list:
+        """
+        Probe a batch of images concurrently. Returns a list of `ImageInfo`
+        in the same order as `images`, with None for any that failed. The
+        whole batch shares one session, pooling up to `workers` connections.
+
+        Usage
+        -----
+        ```
+        post = Posts(tags="akemi_homura")
+        handler = RequestHandler()
+        images = [Image(post.image_url(json), Safebooru().image_ext(json))
+                  for json in post.fetch_json(handler)]
+        big = [img for img, info in
+               zip(images, Image.probe_many(images, handler))
+               if info is not None and info.width >= 1920]
+        ```
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        from requests.adapters import HTTPAdapter
+
+        with handler.session as session:
+            adapter = HTTPAdapter(pool_connections=workers,
+                                  pool_maxsize=workers)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+
+            def probe(image: Image) -> ImageInfo | None:
+                try: return image.probe(handler, session=session, **kwargs)
+                except Exception: return None
+
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                return list(executor.map(probe, images))
+
+
+@dataclass
+class Post:
+    """
+    A single post from a `Posts` json response, as returned by
+    `Posts.fetch_posts`. Can still be indexed like the json dict (post["id"])
+    so it works with `Posts.image_url`, `Safebooru.image_ext` etc.
+
+    Not frozen, frozen dataclasses make building each post ~1.5x slower and
+    there are up to 100 of these for every page. `sample` and `has_notes`
+    accept 0/ 1 as well as booleans, as Gelbooru APIs have sent both.
+    """
+    id: int
+    directory: int | str
+    image: str
+    hash: str = str()
+    width: int = 0
+    height: int = 0
+    tags: str = str()
+    rating: str = str()
+    score: int | None = None
+    owner: str = str()
+    parent_id: int = 0
+    change: int = 0
+    sample: bool | int = False
+    sample_width: int = 0
+    sample_height: int = 0
+    file_url: str = str()
+    sample_url: str = str()
+    preview_url: str = str()
+    source: str = str()
+    status: str = str()
+    has_notes: bool | int = False
+    comment_count: int = 0
+
+    def __getitem__(self, key: str):
+        return getattr(self, key)
+
+    @classmethod
+    def from_dict(cls, json: dict) -> "Post":
+        """
+        Build from a post's json dict, ignoring any keys not known here.
+        Raises ValueError if it is not a dict, is missing `id`, `directory`
+        or `image`, or a value is not of the field's type (exact type, so no
+        coercion and a bool is not an int; same as the msgspec backend).
+        """
+        if type(json) is not dict:
+            raise ValueError(f"Expected a post object, got " \
+                             f"{type(json).__name__}")
+        known = dict()
+        for key, value in json.items():
+            types = _POST_TYPES.get(key)
+            if types is None: continue
+            if type(value) not in types:
+                raise ValueError(f"Post field {key!r} got " \
+                                 f"{type(value).__name__}")
+            known[key] = value
+        if not _POST_REQUIRED <= known.keys():
+            missing = ", ".join(sorted(_POST_REQUIRED - known.keys()))
+            raise ValueError(f"Post missing required field[s]: {missing}")
+        return cls(**known)
+
+
+# Field name -> accepted types (unions split up), for `Post.from_dict`.
+_POST_TYPES = {field.name: getattr(field.type, "__args__", (field.type,))
+               for field in fields(Post)}
+_POST_REQUIRED = frozenset(field.name for field in fields(Post)
+                           if field.default is MISSING)
+
 
 @dataclass(frozen=True)
 class Posts:
@@ -221,7 +627,22 @@ class Posts:
         post = Posts(id=Safebooru().random_id)  # Use completely random ID.
         print(post.fetch_json(handler))
         """
-        return handler.get(self.url).json()
+        return handler.decoder.decode(handler.get(self.url).content)
+
+    def fetch_posts(self, handler: RequestHandler) -> list[Post]:
+        """
+        Fetch and parse the response into typed `Post` objects, an empty list
+        if no posts matched.
+
+        Usage
+        -----
+        ```
+        handler = RequestHandler()
+        for post in Posts(tags="akemi_homura").fetch_posts(handler):
+            print(post.id, post.width, post.height)
+        ```
+        """
+        return handler.decoder.decode_posts(handler.get(self.url).content)
 
     def fetch_content(self, handler: RequestHandler) -> str:
         """
@@ -304,6 +725,7 @@ class Tags:
         print(tags.fetch_json(handler))
         ```
         """
+        import xmltodict
         return xmltodict.parse(handler.get(self.url).text)
 
     def fetch_content(self, handler: RequestHandler) -> str:
@@ -363,6 +785,7 @@ class Comments:
         print(comms.fetch_json(handler))
         ```
         """
+        import xmltodict
         return xmltodict.parse(handler.get(self.url).text)
 
     def fetch_content(self, handler: RequestHandler) -> str:
@@ -380,9 +803,10 @@ class Safebooru(RequestHandler):
     _HOMEPAGE = "https://safebooru.org"
     _DEST = "index.php?"
 
-    def __init__(self, headers: dict = None) -> None:
-        super().__init__(headers)
-        self.__handler = RequestHandler(headers=headers)
+    def __init__(self, headers: dict = None,
+                 decoder: JSONDecoder = None) -> None:
+        super().__init__(headers, decoder)
+        self.__handler = RequestHandler(headers=headers, decoder=self.decoder)
 
     @property
     def handler(self) -> RequestHandler:
@@ -393,7 +817,7 @@ class Safebooru(RequestHandler):
         return self.__handler
 
     @property
-    def session(self) -> Session:
+    def session(self) -> "requests.Session":
         """
         Point to self.__handler.session instance object instead.
         """
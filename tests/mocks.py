@@ -0,0 +1,50 @@
+"""
+Shared `unittest.mock` stand-ins for requests responses and handlers, so the
+tests that do not need safebooru.org never touch the network.
+"""
+
+
+from unittest import mock
+
+from requests import HTTPError
+
+
+def response(content: bytes = b"", status_code: int = 200) -> mock.Mock:
+    """
+    A mock `requests.Response` for `content`; `raise_for_status` raises an
+    `HTTPError` for 4xx/ 5xx codes like the real one.
+    """
+    resp = mock.Mock(content=content, status_code=status_code)
+    resp.text = content.decode(errors="replace")
+    if status_code >= 400:
+        resp.raise_for_status.side_effect = HTTPError(f"{status_code} Error",
+                                                      response=resp)
+    resp.iter_content.side_effect = lambda chunk_size=1, **kwargs: (
+        content[i:i + chunk_size] for i in range(0, len(content), chunk_size))
+    return resp
+
+
+def ranged(data: bytes, honour: bool = True) -> callable:
+    """
+    A `get` side effect serving `data` like a server would for a Range
+    header: 206 with the range, 416 past the end, or (if `honour` is False,
+    a server ignoring ranges) 200 with everything.
+    """
+    def get(url: str, headers: dict = None, **kwargs) -> mock.Mock:
+        byte_range = (headers or dict()).get("Range")
+        if byte_range is None or not honour: return response(data)
+        start, end = map(int, byte_range[6:].split("-"))
+        if start >= len(data): return response(b"", 416)
+        return response(data[start:end + 1], 206)
+    return get
+
+
+def handler(get: callable) -> mock.Mock:
+    """
+    A mock `RequestHandler` whose `get` and `session.get` both call `get`.
+    The session works as a context manager and records `mount`/ `close`.
+    """
+    session = mock.MagicMock()
+    session.__enter__.return_value = session
+    session.get.side_effect = get
+    return mock.Mock(get=session.get, session=session)
@@ -0,0 +1,140 @@
+import struct
+import zlib
+from unittest import TestCase
+
+from src import safebooru2
+from tests import mocks
+
+
+def png(width, height, frames=None, iccp=0):
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + \
+               struct.pack(">I", zlib.crc32(kind + data))
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    data = b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr)
+    if iccp:
+        data += chunk(b"iCCP", b"\x00" * iccp)
+    if frames is not None:
+        data += chunk(b"acTL", struct.pack(">II", frames, 0))
+    return data + chunk(b"IDAT", zlib.compress(b"\x00" * 64))
+
+
+def jpg(width, height, exif=0):
+    app1 = b"\xff\xe1" + struct.pack(">H", exif + 2) + b"\x00" * exif
+    sof = b"\xff\xc0" + struct.pack(">HBHHB", 11, 8, height, width, 1) + \
+          b"\x01\x11\x00"
+    return b"\xff\xd8" + app1 + sof + b"\xff\xda"
+
+
+def gif(width, height, frames, pixels=b"\x44\x01", looping=True):
+    data = b"GIF89a" + struct.pack("<HHBBB", width, height, 0x80, 0, 0) + \
+           b"\x00" * 6  # Two entry global colour table.
+    if looping: data += b"\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00"
+    for _ in range(frames):
+        data += b"\x21\xf9\x04\x00\x00\x00\x00\x00"
+        data += b"\x2c" + struct.pack("<HHHHB", 0, 0, width, height, 0)
+        data += b"\x02" + b"".join(bytes([len(pixels[i:i + 255])]) +
+                                    pixels[i:i + 255]
+                                    for i in range(0, len(pixels), 255))
+        data += b"\x00"
+    return data + b"\x3b"
+
+
+class TestImageInfo(TestCase):
+    def test_png(self):
+        info = safebooru2.ImageInfo.from_bytes(png(640, 480))
+        self.assertEqual(info, safebooru2.ImageInfo(
+                         safebooru2.ImageType.PNG, 640, 480, 1, False))
+
+    def test_apng_frames(self):
+        info = safebooru2.ImageInfo.from_bytes(png(10, 20, frames=12))
+        self.assertEqual((info.frames, info.animated), (12, True))
+
+    def test_apng_acTL_past_data(self):
+        data = png(10, 20, frames=12, iccp=5000)
+        self.assertIsNone(safebooru2.ImageInfo.from_bytes(data[:4096]))
+
+    def test_jpg(self):
+        info = safebooru2.ImageInfo.from_bytes(jpg(1920, 1080, exif=100))
+        self.assertEqual(info.type, safebooru2.ImageType.JPG)
+        self.assertEqual((info.width, info.height), (1920, 1080))
+
+    def test_gif_frames(self):
+        info = safebooru2.ImageInfo.from_bytes(gif(32, 16, 3))
+        self.assertEqual((info.type, info.width, info.height, info.frames,
+                          info.animated),
+                         (safebooru2.ImageType.GIF, 32, 16, 3, True))
+
+    def test_gif_truncated_frames(self):
+        data = gif(32, 16, 3, pixels=bytes(255) * 40)
+        info = safebooru2.ImageInfo.from_bytes(data[:4096])
+        self.assertEqual((info.width, info.frames, info.animated),
+                         (32, None, True))
+
+    def test_gif_animated_unknown(self):
+        data = gif(32, 16, 3, pixels=bytes(255) * 40, looping=False)
+        info = safebooru2.ImageInfo.from_bytes(data[:4096])
+        self.assertEqual((info.frames, info.animated), (None, None))
+        info = safebooru2.ImageInfo.from_bytes(gif(32, 16, 1, looping=False))
+        self.assertEqual((info.frames, info.animated), (1, False))
+
+    def test_truncated(self):
+        self.assertIsNone(safebooru2.ImageInfo.from_bytes(jpg(1, 1, 100)[:50]))
+
+    def test_unknown(self):
+        data = b"<!DOCTYPE html>"
+        self.assertRaises(ValueError,
+                          lambda: safebooru2.ImageInfo.from_bytes(data))
+
+
+class TestImageProbe(TestCase):
+    def setUp(self):
+        self.image = safebooru2.Image("https://safebooru.org/images/1/a.jpg"
+                                      "?1", "j")
+
+    def ranges(self, handler):
+        return [call.kwargs["headers"]["Range"]
+                for call in handler.session.get.call_args_list]
+
+    def test_probe_grows_range(self):
+        handler = mocks.handler(mocks.ranged(
+            jpg(800, 600, exif=10000) + b"\x00" * 50000))
+        info = self.image.probe(handler, size=4096)
+        self.assertEqual((info.width, info.height), (800, 600))
+        self.assertEqual(self.ranges(handler), ["bytes=0-4095",
+                         "bytes=4096-8191", "bytes=8192-16383"])
+        # One session for all three requests, closed afterwards.
+        self.assertEqual(handler.session.__exit__.call_count, 1)
+
+    def test_probe_range_ignored(self):
+        handler = mocks.handler(mocks.ranged(
+            jpg(800, 600, exif=6000) + b"\x00" * 50000, honour=False))
+        info = self.image.probe(handler, size=4096)
+        self.assertEqual((info.width, info.height), (800, 600))
+
+    def test_probe_apng(self):
+        handler = mocks.handler(mocks.ranged(png(10, 20, frames=12,
+                                                 iccp=5000)))
+        self.assertEqual(self.image.probe(handler).frames, 12)
+
+    def test_probe_no_header(self):
+        handler = mocks.handler(mocks.ranged(jpg(800, 600, exif=10000)))
+        self.assertRaises(ValueError, lambda: self.image.probe(
+                          handler, size=1024, max_size=4096))
+        handler = mocks.handler(mocks.ranged(
+            jpg(800, 600, exif=4092)[:4096]))
+        self.assertRaises(ValueError, lambda: self.image.probe(
+                          handler, size=1024, max_size=4096))
+
+    def test_probe_many(self):
+        images = [self.image] * 3
+        handler = mocks.handler(mocks.ranged(png(5, 6)))
+        infos = safebooru2.Image.probe_many(images, handler, workers=2)
+        self.assertEqual([(i.width, i.height) for i in infos], [(5, 6)] * 3)
+        # The batch shares one pooled session, closed once at the end.
+        self.assertEqual(handler.session.__exit__.call_count, 1)
+        adapter = handler.session.mount.call_args.args[1]
+        self.assertEqual(adapter._pool_maxsize, 2)
+        handler = mocks.handler(mocks.ranged(b"nope, not an image"))
+        self.assertEqual(safebooru2.Image.probe_many(images, handler),
+                         [None] * 3)
@@ -0,0 +1,235 @@
+import json
+import sqlite3
+from os import path, listdir, makedirs
+from tempfile import TemporaryDirectory
+from unittest import TestCase, mock
+
+from src import safebooru2
+from src.safebooru2 import jobs
+from tests import mocks
+
+
+def crawl_site(sb, pages=(), image=b"img"):
+    """
+    Point `sb`'s handler at a fake site serving `pages` (lists of post IDs)
+    for post queries in order, and `image` (a 404 if None) for anything else.
+    """
+    pages = list(pages)
+
+    def get(url, **kwargs):
+        if "s=post" in url:
+            return mocks.response(json.dumps([{"id": i, "directory": 1,
+                                  "image": f"{i}.png"} for i in
+                                  pages.pop(0)]).encode())
+        if image is None: return mocks.response(b"Not Found", 404)
+        return mocks.response(image)
+
+    sb.handler.get = mock.Mock(side_effect=get)
+    return sb
+
+
+class TestJobQueue(TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.queue = safebooru2.JobQueue(path.join(self.tmp.name, "q.db"),
+                                         max_attempts=2, backoff=0)
+
+    def tearDown(self):
+        self.queue.close()
+        self.tmp.cleanup()
+
+    def test_put_key_dedupe(self):
+        self.assertIsNotNone(self.queue.put(jobs.PAGE, {}, key="a"))
+        self.assertIsNone(self.queue.put(jobs.PAGE, {}, key="a"))
+
+    def test_lease_priority(self):
+        self.queue.put(jobs.PAGE, {"n": 1})
+        self.queue.put(jobs.DOWNLOAD, {"n": 2}, priority=1)
+        job = self.queue.lease("w")
+        self.assertEqual(job.payload, {"n": 2})
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(self.queue.lease("w").payload, {"n": 1})
+        self.assertIsNone(self.queue.lease("w"))
+
+    def test_expired_lease(self):
+        self.queue.put(jobs.PAGE, {})
+        job = self.queue.lease("a", lease_time=-1)
+        stolen = self.queue.lease("b")
+        self.assertEqual(stolen.id, job.id)
+        self.assertEqual(stolen.attempts, 2)
+        self.assertTrue(self.queue.extend(stolen))
+        self.assertFalse(self.queue.extend(job))
+
+    def test_fail_retry(self):
+        self.queue.put(jobs.PAGE, {})
+        self.assertTrue(self.queue.fail(self.queue.lease("w"), "boom"))
+        self.assertTrue(self.queue.fail(self.queue.lease("w"), "boom"))
+        self.assertIsNone(self.queue.lease("w"))
+        self.assertEqual(self.queue.counts()[jobs.FAILED], 1)
+        self.assertEqual(self.queue.retry_failed(), 1)
+        self.assertIsNotNone(self.queue.lease("w"))
+
+    def test_complete_then_checkpoint(self):
+        self.queue.put(jobs.PAGE, {})
+        self.queue.complete(self.queue.lease("w"),
+                            [{"kind": jobs.PAGE, "payload": {"pid": 1}}],
+                            ("page:foo", 0))
+        self.assertEqual(self.queue.cursor("page:foo"), 0)
+        self.assertEqual(self.queue.lease("w").payload, {"pid": 1})
+        self.assertEqual(self.queue.counts()[jobs.DONE], 1)
+
+    def test_expired_lease_attempts_used(self):
+        self.queue.put(jobs.PAGE, {})
+        self.queue.lease("a", lease_time=-1)
+        self.queue.lease("b", lease_time=-1)
+        self.assertIsNone(self.queue.lease("c"))
+        self.assertEqual(self.queue.counts()[jobs.FAILED], 1)
+
+    def test_lost_lease(self):
+        self.queue.put(jobs.PAGE, {})
+        job = self.queue.lease("a", lease_time=-1)
+        stolen = self.queue.lease("b")
+        self.assertFalse(self.queue.fail(job, "boom"))
+        self.assertFalse(self.queue.complete(job, [{"kind": jobs.PAGE,
+                                                    "payload": {}}]))
+        self.assertIsNone(self.queue.lease("c"))
+        self.assertTrue(self.queue.complete(stolen))
+
+    def test_re_leased_own_job(self):
+        self.queue.put(jobs.PAGE, {})
+        old = self.queue.lease("a", lease_time=-1)
+        self.queue.lease("a")
+        self.assertFalse(self.queue.complete(old))
+
+
+class TestWorker(TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.queue = safebooru2.JobQueue(path.join(self.tmp.name, "q.db"),
+                                         max_attempts=2, backoff=0)
+        self.dir = path.join(self.tmp.name, "out")
+
+    def tearDown(self):
+        self.queue.close()
+        self.tmp.cleanup()
+
+    def worker(self, pages=(), image=b"img"):
+        sb = crawl_site(safebooru2.Safebooru(), pages, image)
+        return safebooru2.Worker(self.queue, sb, "w", verbose=False)
+
+    def urls(self, worker):
+        return [call.args[0] for call in
+                worker.sb.handler.get.call_args_list]
+
+    def test_full_page_queues_next(self):
+        worker = self.worker([[30, 20]])
+        safebooru2.Worker.crawl(self.queue, "foo", 2, self.dir, priority=5)
+        self.assertTrue(worker.run_once())
+        self.assertTrue("tags=foo&" in self.urls(worker)[0])
+        counts = self.queue.counts()
+        self.assertEqual((counts[jobs.DONE], counts[jobs.PENDING]), (1, 3))
+        cp = self.queue.cursor(f"page:foo:2:{self.dir}")
+        self.assertEqual((cp["before"], cp["newest"]), (20, 30))
+        # Downloads first, then the next page below the lowest ID, all still
+        # ahead of a less important crawl queued after page 1.
+        safebooru2.Worker.crawl(self.queue, "bar", 2, self.dir, priority=3)
+        leased = [self.queue.lease("x") for _ in range(4)]
+        self.assertEqual([job.kind for job in leased],
+                         [jobs.DOWNLOAD, jobs.DOWNLOAD, jobs.PAGE, jobs.PAGE])
+        self.assertEqual(leased[3].payload["tags"], "bar")
+
+    def test_short_page_ends_pass(self):
+        worker = self.worker([[30, 20], [10], [], [40]])
+        safebooru2.Worker.crawl(self.queue, "foo", 2, self.dir)
+        worker.run()
+        self.assertTrue("tags=foo+id:<20&" in self.urls(worker)[3])
+        name = f"page:foo:2:{self.dir}"
+        self.assertEqual(self.queue.cursor(name)["before"], None)
+        self.assertEqual(self.queue.counts()[jobs.DONE], 5)
+        # Re-running a finished crawl only looks for newer posts.
+        self.assertIsNotNone(
+            safebooru2.Worker.crawl(self.queue, "foo", 2, self.dir))
+        worker.run()
+        self.assertTrue("id:>30" in self.urls(worker)[-1])
+        self.assertEqual(self.queue.cursor(name)["newest"], 30)
+        safebooru2.Worker.crawl(self.queue, "foo", 2, self.dir)
+        worker.run()
+        self.assertTrue("id:>30" in self.urls(worker)[-2])
+        self.assertEqual(self.queue.cursor(name)["newest"], 40)
+
+    def test_empty_page(self):
+        safebooru2.Worker.crawl(self.queue, "foo", 2, self.dir)
+        self.worker([[]]).run()
+        self.assertEqual(self.queue.counts()[jobs.DONE], 1)
+        cp = self.queue.cursor(f"page:foo:2:{self.dir}")
+        self.assertEqual((cp["before"], cp["newest"]), (None, None))
+
+    def test_crawl_dedupe_by_directory(self):
+        self.assertIsNotNone(safebooru2.Worker.crawl(self.queue, "x",
+                                                     directory="a"))
+        self.assertIsNone(safebooru2.Worker.crawl(self.queue, "x",
+                                                  directory="a"))
+        self.assertIsNotNone(safebooru2.Worker.crawl(self.queue, "x",
+                                                     directory="b"))
+
+    def test_download(self):
+        safebooru2.Worker.crawl(self.queue, "foo", 2, self.dir)
+        self.worker([[1]], image=b"png bytes").run()
+        with open(path.join(self.dir, "1.png"), "rb") as file_object:
+            self.assertEqual(file_object.read(), b"png bytes")
+
+    def test_download_http_error(self):
+        safebooru2.Worker.crawl(self.queue, "foo", 2, self.dir)
+        self.worker([[1]], image=None).run()
+        self.assertEqual(listdir(self.dir), [])  # No image, no .part files.
+        self.assertEqual(self.queue.counts()[jobs.FAILED], 1)
+
+    def test_download_part_unique(self):
+        self.queue.put(jobs.DOWNLOAD, {"url": "https://safebooru.org/a?1",
+                                       "ext": "p", "filename": 1,
+                                       "directory": self.dir})
+        makedirs(self.dir)
+        worker = self.worker()
+        parts = list()
+
+        def get(url, **kwargs):
+            parts.extend(listdir(self.dir))
+            resp = mocks.response(b"img")
+            resp.iter_content.side_effect = lambda **kwargs: \
+                (parts.extend(listdir(self.dir)) or [b"img"])
+            return resp
+        worker.sb.handler.get.side_effect = get
+        worker.run()
+        self.assertEqual(len(parts), 1)
+        self.assertTrue(parts[0].startswith(".1.png.") and
+                        parts[0].endswith(".part"))
+        self.assertEqual(listdir(self.dir), ["1.png"])
+
+    def test_run_waits_for_other_leases(self):
+        safebooru2.Worker.crawl(self.queue, "foo", 2, self.dir)
+        other = self.queue.lease("other", lease_time=0.2)
+        worker = self.worker([[]])
+        with mock.patch.object(jobs, "sleep") as sleep:
+            worker.run(poll=0.1)
+        # Waited for the other worker's lease to run out, then took over.
+        self.assertTrue(sleep.called)
+        self.assertEqual(self.queue.counts()[jobs.DONE], 1)
+        self.assertFalse(self.queue.complete(other))
+
+    def test_fail_backoff(self):
+        queue = safebooru2.JobQueue(path.join(self.tmp.name, "b.db"),
+                                    backoff=60)
+        queue.put(jobs.PAGE, {})
+        self.assertTrue(queue.fail(queue.lease("w"), "429"))
+        self.assertIsNone(queue.lease("w"))
+        self.assertEqual(queue.counts()[jobs.PENDING], 1)
+        queue.close()
+
+    def test_lease_uses_index(self):
+        self.queue.put(jobs.PAGE, {})
+        conn = sqlite3.connect(path.join(self.tmp.name, "q.db"))
+        plan = " ".join(row[3] for row in conn.execute(
+            "EXPLAIN QUERY PLAN " + jobs._NEXT_JOB, (jobs.PENDING, 0)))
+        conn.close()
+        self.assertTrue("jobs_ready" in plan)
+        self.assertTrue("TEMP B-TREE" not in plan)
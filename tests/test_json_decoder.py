@@ -0,0 +1,73 @@
+import json
+import importlib.util
+from unittest import TestCase, skipUnless
+
+from src import safebooru2
+
+
+PAYLOAD = b'[{"preview_url":"https://safebooru.org/thumbnails/3466/thumbnai' \
+          b'l_05ab7746.jpg","sample_url":"","file_url":"","directory":3466,"' \
+          b'hash":"05ab77469b43f563","width":1200,"height":900,"id":3605424,' \
+          b'"image":"05ab77469b43f563.png","change":1656003381,"owner":"dan' \
+          b'booru","parent_id":0,"rating":"general","sample":false,"sample_h' \
+          b'eight":0,"sample_width":0,"score":null,"tags":"akemi_homura","so' \
+          b'urce":"","status":"active","has_notes":false,"comment_count":0,' \
+          b'"not_a_field":1}]'
+
+
+class TestJSONDecoder(TestCase):
+    def check_backend(self, backend):
+        decoder = safebooru2.JSONDecoder(backend)
+        self.assertEqual(decoder.backend, backend)
+        self.assertEqual(decoder.decode(PAYLOAD)[0]["id"], 3605424)
+        post = decoder.decode_posts(PAYLOAD)[0]
+        self.assertEqual(type(post), safebooru2.Post)
+        self.assertEqual((post.id, post.width, post.score),
+                         (3605424, 1200, None))
+        self.assertEqual(post["image"], "05ab77469b43f563.png")
+        self.assertEqual(decoder.decode_posts(b""), [])
+        for bad in (b'[{"id": 1,', b"<html>"):
+            self.assertRaises(json.JSONDecodeError,
+                              lambda: decoder.decode(bad))
+            self.assertRaises(ValueError, lambda: decoder.decode_posts(bad))
+        # Same validation, and no coercion, whichever backend builds posts.
+        for bad in (b'[{"id": "1", "directory": 1, "image": "a.png"}]',
+                    b'[{"id": true, "directory": 1, "image": "a.png"}]',
+                    b'[{"directory": 1, "image": "a.png"}]',
+                    b'{"id": 1, "directory": 1, "image": "a.png"}', b"[1]"):
+            self.assertRaises(ValueError, lambda: decoder.decode_posts(bad))
+
+    def test_stdlib(self):
+        self.check_backend("json")
+
+    @skipUnless(importlib.util.find_spec("orjson"), "orjson not installed")
+    def test_orjson(self):
+        self.check_backend("orjson")
+
+    @skipUnless(importlib.util.find_spec("msgspec"), "msgspec not installed")
+    def test_msgspec(self):
+        self.check_backend("msgspec")
+
+    def test_auto_backend(self):
+        self.assertTrue(safebooru2.JSONDecoder().backend in
+                        safebooru2.JSONDecoder.BACKENDS)
+
+    @skipUnless(importlib.util.find_spec("orjson") and
+                importlib.util.find_spec("msgspec"), "needs orjson & msgspec")
+    def test_backend_per_method(self):
+        decoder = safebooru2.JSONDecoder()
+        self.assertEqual((decoder.backend, decoder.posts_backend),
+                         ("orjson", "msgspec"))
+        decoder = safebooru2.JSONDecoder("json")
+        self.assertEqual((decoder.backend, decoder.posts_backend),
+                         ("json", "json"))
+
+    def test_unknown_backend(self):
+        self.assertRaises(ValueError, lambda: safebooru2.JSONDecoder("yaml"))
+
+    def test_post_works_with_image_url(self):
+        post = safebooru2.JSONDecoder("json").decode_posts(PAYLOAD)[0]
+        self.assertEqual(safebooru2.Posts().image_url(post),
+                         "https://safebooru.org/images/3466/05ab77469b43f56" \
+                         "3.png?3605424")
+        self.assertEqual(safebooru2.Safebooru().image_ext(post), "p")
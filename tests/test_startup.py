@@ -0,0 +1,27 @@
+import sys
+import subprocess
+from unittest import TestCase
+
+from src import safebooru2
+
+
+class TestStartup(TestCase):
+    def test_lazy_imports(self):
+        """
+        Run in a fresh interpreter, this one has likely imported them already.
+        """
+        code = "import sys; from src import safebooru2; " \
+               "print(sorted({'requests', 'xmltodict', 'sqlite3'} " \
+               "& set(sys.modules)))"
+        out = subprocess.run([sys.executable, "-c", code], check=True,
+                             capture_output=True, text=True).stdout
+        self.assertEqual(out.strip(), "[]")
+
+    def test_user_agent_cached(self):
+        a = safebooru2.RequestHandler()._user_agent
+        b = safebooru2.RequestHandler()._user_agent
+        self.assertIs(a, b)
+
+    def test_headers_not_shared(self):
+        safebooru2.RequestHandler().headers["X-Foo"] = "bar"
+        self.assertTrue("X-Foo" not in safebooru2.RequestHandler().headers)